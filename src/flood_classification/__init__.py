@@ -1,9 +1,15 @@
-from .load import load_flood_points, load_raster
+from .export import iter_raster_windows, write_final_parquet
+from .load import BACKENDS, GdalRasterLayer, OgrVectorLayer, load_flood_points, load_raster, set_backend
 from .process import (
+    configure_gdal,
     check_resolution_and_crs,
     raster_to_dataframe,
+    raster_to_values,
+    compute_grid_xy,
     transform_to_raster,
     create_final_dataframe,
+    create_final_array,
+    FEATURE_COLUMNS,
     calculate_distance_to_features,
     transform_vector_to_binary_raster
 )
\ No newline at end of file
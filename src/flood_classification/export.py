@@ -0,0 +1,337 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from osgeo import gdal, osr
+
+from .process import FEATURE_COLUMNS, _open_raster, _valid_pixels
+
+# Rows per Parquet row group; windows are buffered along the Hilbert curve until a group is full, so each
+# group covers a compact area of the grid
+ROW_GROUP_SIZE = 100_000
+
+# Schema of the exported dataset: the six features, the pixel position on the DTM grid,
+# its position along a Hilbert curve (the sort key within each row group), and a GeoParquet point geometry.
+# Elevations and distances are quantized to integers; decode them as value * scale_factor + add_offset.
+# Fields with a valid_min/valid_max (in stored units) write values outside that range as nulls; the others
+# are clipped to their type's range, so distances beyond 65535 m are capped.
+PARQUET_SCHEMA = pa.schema([
+    pa.field("dtm_value", pa.int16(), metadata={
+        "scale_factor": "0.1", "add_offset": "0", "units": "m", "valid_min": "-32768", "valid_max": "32767",
+    }),
+    pa.field("lulc_code", pa.dictionary(pa.int16(), pa.uint8()), metadata={"valid_min": "0", "valid_max": "255"}),
+    ("flood_binary", pa.uint8()),
+    pa.field("dist_to_river", pa.uint16(), metadata={"scale_factor": "1", "add_offset": "0", "units": "m"}),
+    pa.field("dist_to_tributaries", pa.uint16(), metadata={"scale_factor": "1", "add_offset": "0", "units": "m"}),
+    ("is_basin", pa.uint8()),
+    ("row", pa.int32()),
+    ("col", pa.int32()),
+    ("x", pa.float64()),
+    ("y", pa.float64()),
+    ("hilbert_index", pa.uint64()),
+    ("geometry", pa.binary()),
+])
+
+# Every possible LULC code, shared by all record batches so the Parquet writer keeps a single dictionary
+# instead of falling back to plain encoding when the batch dictionaries differ
+LULC_DICTIONARY = pa.array(np.arange(256, dtype=np.uint8))
+
+# Little-endian WKB point layout: byte order, geometry type, x, y (21 bytes, no padding)
+WKB_POINT_DTYPE = np.dtype([("byte_order", "u1"), ("geometry_type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+
+
+def iter_raster_windows(rasters, block_size=(512, 512), hilbert=False):
+    """
+    Reads rasters that share the same grid window by window, in lock step.
+
+    Only one window per raster is held in memory at a time, so the full grid is never materialized.
+
+    Args:
+        rasters (dict): Maps a name to a raster layer, or to a value array of shape (height, width) on the grid.
+        block_size (tuple, optional): The (width, height) of each window in pixels.
+        hilbert (bool, optional): If True, visit the windows along the Hilbert curve of the grid instead of
+            row by row. With square power-of-two windows each window is one contiguous stretch of the curve.
+
+    Yields:
+        tuple: (row_offset, col_offset, windows), where `windows` maps each name to a float32 array
+            of the window with NoData replaced by np.nan.
+
+    Raises:
+        ValueError: If the rasters do not all have the same width and height.
+    """
+    sources = {}
+    for name, raster in rasters.items():
+        if isinstance(raster, np.ndarray):
+            sources[name] = raster
+        else:
+            dataset = _open_raster(raster)
+            sources[name] = (dataset, dataset.GetRasterBand(1))
+
+    shapes = {_source_shape(source) for source in sources.values()}
+    if len(shapes) != 1:
+        raise ValueError("All rasters must share the same grid to be read window by window.")
+    height, width = shapes.pop()
+    block_width, block_height = block_size
+
+    offsets = [
+        (row_offset, col_offset)
+        for row_offset in range(0, height, block_height)
+        for col_offset in range(0, width, block_width)
+    ]
+    if hilbert:
+        # Any pixel of a window gives its position along the curve; the top-left one is used
+        row_offsets, col_offsets = np.array(offsets, dtype=np.int64).reshape(-1, 2).T
+        curve = _hilbert_index(row_offsets, col_offsets, _hilbert_order(width, height))
+        offsets = [offsets[i] for i in np.argsort(curve, kind="stable")]
+
+    for row_offset, col_offset in offsets:
+        rows = min(block_height, height - row_offset)
+        cols = min(block_width, width - col_offset)
+        windows = {
+            name: _read_window(source, col_offset, row_offset, cols, rows)
+            for name, source in sources.items()
+        }
+        yield row_offset, col_offset, windows
+
+
+def write_final_parquet(dtm, lulc, flood, river, tributaries, basin, output_path, block_size=(512, 512),
+                        basin_only=False):
+    """
+    Streams the six feature rasters into a GeoParquet file, one raster window at a time.
+
+    This produces the same rows as `create_final_dataframe` (NaN flood and basin values become 0, and
+    pixels without a DTM or LULC value are dropped) while peak memory stays at roughly one window of
+    every raster plus one buffered row group, instead of six full-grid DataFrames.
+
+    The windows are visited along a Hilbert curve of (row, col) and the rows of each window are sorted along
+    it, then buffered into row groups of `ROW_GROUP_SIZE` rows. Every row group therefore covers a compact
+    area and its min/max statistics on row, col, x, and y let readers skip row groups outside a bounding box.
+    The pixel centers are also stored as WKB points with GeoParquet `geo` metadata.
+    With `basin_only`, pixels outside the basin are dropped as well; their `row` and `col` keep them addressable.
+
+    Args:
+        dtm: The DTM raster layer; its grid defines the pixel positions and coordinates.
+        lulc: The LULC raster layer or value array on the DTM grid.
+        flood: The binary flood raster layer or value array on the DTM grid.
+        river: The river distance raster layer or value array on the DTM grid.
+        tributaries: The tributaries distance raster layer or value array on the DTM grid.
+        basin: The binary basin raster layer or value array on the DTM grid.
+        output_path (str): The file path of the Parquet file.
+        block_size (tuple, optional): The (width, height) of each window in pixels.
+        basin_only (bool, optional): If True, only write pixels with an `is_basin` value of 1.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rasters = dict(zip(FEATURE_COLUMNS, (dtm, lulc, flood, river, tributaries, basin)))
+
+    extent = dtm.extent()
+    x_origin = extent.xMinimum()
+    y_origin = extent.yMaximum()
+    pixel_width = dtm.rasterUnitsPerPixelX()
+    pixel_height = dtm.rasterUnitsPerPixelY()
+    hilbert_order = _hilbert_order(dtm.width(), dtm.height())
+
+    schema = PARQUET_SCHEMA.with_metadata({b"geo": json.dumps(_geo_metadata(dtm))})
+    writer_options = dict(
+        compression="zstd",
+        compression_level=3,
+        use_dictionary=["lulc_code"],
+        write_statistics=True,
+        sorting_columns=[pq.SortingColumn(schema.get_field_index("hilbert_index"))],
+    )
+
+    total_rows = 0
+    buffer = []
+    buffered_rows = 0
+    with pq.ParquetWriter(output_path, schema, **writer_options) as writer:
+        for row_offset, col_offset, windows in iter_raster_windows(rasters, block_size, hilbert=True):
+            values = {name: window.ravel() for name, window in windows.items()}
+
+            # A value of NaN in flood or basin means no flood or not in the basin, so fill with 0
+            for name in ("flood_binary", "is_basin"):
+                values[name][np.isnan(values[name])] = 0
+
+            valid = _valid_pixels(values["dtm_value"], values["lulc_code"], values["is_basin"], basin_only)
+            if valid.size == 0:
+                continue
+
+            window_width = windows["dtm_value"].shape[1]
+            rows = (row_offset + valid // window_width).astype(np.int32)
+            cols = (col_offset + valid % window_width).astype(np.int32)
+
+            # Order the window's pixels along the Hilbert curve so neighbouring pixels share row groups
+            hilbert_index = _hilbert_index(rows, cols, hilbert_order)
+            order = np.argsort(hilbert_index, kind="stable")
+            valid, rows, cols, hilbert_index = valid[order], rows[order], cols[order], hilbert_index[order]
+            xs = x_origin + (cols + 0.5) * pixel_width
+            ys = y_origin - (rows + 0.5) * pixel_height
+
+            arrays = [
+                _encode_column(values[name][valid], field)
+                for name, field in zip(FEATURE_COLUMNS, PARQUET_SCHEMA)
+            ]
+            # The location columns are contiguous arrays of the schema's types, so Arrow wraps their buffers
+            locations = {"row": rows, "col": cols, "x": xs, "y": ys, "hilbert_index": hilbert_index}
+            arrays += [pa.array(column, type=PARQUET_SCHEMA.field(name).type) for name, column in locations.items()]
+            arrays.append(_wkb_points(xs, ys))
+            buffer.append(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            buffered_rows += valid.size
+            total_rows += valid.size
+
+            # write_batch closes a row group on every call, so batches are buffered until a full group is ready
+            while buffered_rows >= ROW_GROUP_SIZE:
+                table = pa.Table.from_batches(buffer, schema=schema)
+                _write_row_group(writer, table.slice(0, ROW_GROUP_SIZE))
+                rest = table.slice(ROW_GROUP_SIZE)
+                buffer, buffered_rows = rest.to_batches(), rest.num_rows
+
+        if buffered_rows:
+            _write_row_group(writer, pa.Table.from_batches(buffer, schema=schema))
+
+    print(f"{total_rows} rows written to {output_path}.")
+    return total_rows
+
+
+def _write_row_group(writer, table):
+    """
+    Writes a table as a single row group, sorted by `hilbert_index` as declared in the file's sorting columns.
+    """
+    # Windows that are not square powers of two do not each cover one stretch of the curve, so their rows may interleave
+    table = table.sort_by("hilbert_index")
+    writer.write_table(table, row_group_size=table.num_rows)
+
+
+def _encode_column(values, field):
+    """
+    Converts a float32 feature column to the Arrow type of its schema field.
+
+    Integer fields are quantized by the field's `scale_factor` and rounded. Values outside the field's
+    `valid_min`/`valid_max` are stored as nulls, like NaN values; fields without a valid range are clipped
+    to the type's range instead. Dictionary fields store the quantized codes as indices into
+    `LULC_DICTIONARY`. The values are modified in place, so pass a copy the caller owns.
+    """
+    value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+    dtype = np.dtype(value_type.to_pandas_dtype())
+    missing = np.isnan(values)
+
+    if np.issubdtype(dtype, np.integer):
+        metadata = field.metadata or {}
+        scale = float(metadata.get(b"scale_factor", 1))
+        info = np.iinfo(dtype)
+        if scale != 1:
+            values = values / scale
+        np.rint(values, out=values)
+        if b"valid_min" in metadata:
+            # A clipped elevation or LULC code would look like a real one, so values that do not fit are nulls
+            missing |= values < float(metadata[b"valid_min"])
+            missing |= values > float(metadata[b"valid_max"])
+        else:
+            np.clip(values, info.min, info.max, out=values)
+        values[missing] = 0
+
+    has_missing = bool(missing.any())
+
+    if pa.types.is_dictionary(field.type):
+        # Codes index the dictionary of every possible code directly, so no per-batch lookup table is needed
+        indices = pa.array(
+            values.astype(field.type.index_type.to_pandas_dtype()), mask=missing if has_missing else None
+        )
+        return pa.DictionaryArray.from_arrays(indices, LULC_DICTIONARY)
+
+    # Arrow adopts the contiguous NumPy buffer as the column's data instead of copying it;
+    # only a validity bitmap is added when there are nulls
+    return pa.array(
+        np.ascontiguousarray(values, dtype=dtype), type=field.type, mask=missing if has_missing else None
+    )
+
+
+def _geo_metadata(dtm):
+    """
+    Builds the GeoParquet `geo` metadata describing the point geometry column in the CRS of the DTM.
+    """
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(_open_raster(dtm).GetProjection())
+    return {
+        "version": "1.1.0",
+        "primary_column": "geometry",
+        "columns": {
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": ["Point"],
+                "crs": json.loads(srs.ExportToPROJJSON()),
+            },
+        },
+    }
+
+
+def _hilbert_order(width, height):
+    """
+    Returns the order of the smallest Hilbert curve whose 2**order x 2**order grid covers a raster.
+    """
+    return max(1, (max(width, height) - 1).bit_length())
+
+
+def _hilbert_index(rows, cols, order):
+    """
+    Returns the distance of each (row, col) cell along a Hilbert curve filling a 2**order x 2**order grid.
+    """
+    n = 1 << order
+    x = cols.astype(np.uint64)
+    y = rows.astype(np.uint64)
+    index = np.zeros(x.shape, dtype=np.uint64)
+
+    s = n >> 1
+    while s > 0:
+        rx = (x & np.uint64(s)) > 0
+        ry = (y & np.uint64(s)) > 0
+        index += np.uint64(s * s) * ((np.uint64(3) * rx) ^ ry).astype(np.uint64)
+
+        # Rotate the lower quadrants so the curve stays continuous
+        flip = rx & ~ry
+        x = np.where(flip, np.uint64(n - 1) - x, x)
+        y = np.where(flip, np.uint64(n - 1) - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+
+    return index
+
+
+def _wkb_points(xs, ys):
+    """
+    Encodes coordinate arrays as a binary Arrow array of little-endian WKB points without a Python loop.
+    """
+    wkb = np.empty(xs.size, dtype=WKB_POINT_DTYPE)
+    wkb["byte_order"] = 1
+    wkb["geometry_type"] = 1
+    wkb["x"] = xs
+    wkb["y"] = ys
+    offsets = np.arange(0, (xs.size + 1) * WKB_POINT_DTYPE.itemsize, WKB_POINT_DTYPE.itemsize, dtype=np.int32)
+    buffers = [None, pa.py_buffer(offsets), pa.py_buffer(wkb.view(np.uint8))]
+    return pa.Array.from_buffers(pa.binary(), xs.size, buffers)
+
+
+def _source_shape(source):
+    """
+    Returns the (height, width) of a value array or an open (dataset, band) pair.
+    """
+    if isinstance(source, np.ndarray):
+        return source.shape
+    dataset, _ = source
+    return dataset.RasterYSize, dataset.RasterXSize
+
+
+def _read_window(source, col_offset, row_offset, cols, rows):
+    """
+    Reads a window of a value array or an open (dataset, band) pair as float32, with NoData replaced by np.nan.
+    """
+    if isinstance(source, np.ndarray):
+        return source[row_offset:row_offset + rows, col_offset:col_offset + cols].astype(np.float32)
+
+    _, band = source
+    window = band.ReadAsArray(col_offset, row_offset, cols, rows, buf_type=gdal.GDT_Float32)
+    nodata = band.GetNoDataValue()
+    if nodata is not None:
+        window[window == nodata] = np.nan
+    return window
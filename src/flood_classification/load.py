@@ -1,10 +1,35 @@
-from qgis.core import QgsRasterLayer, QgsVectorLayer
+from osgeo import gdal, ogr, osr
+
+# Layer implementations the loaders can return: QGIS layers, or lightweight GDAL/OGR layers
+# that expose the same methods used by this package without starting QGIS
+BACKENDS = ("qgis", "gdal")
+
+_backend = "qgis"
+
+
+def set_backend(backend: str):
+    """
+    Selects the layer implementation returned by `load_raster` and `load_flood_points`.
+
+    Args:
+        backend (str): "qgis" for QgsRasterLayer/QgsVectorLayer (requires an initialized QgsApplication),
+            or "gdal" for GdalRasterLayer/OgrVectorLayer, which only need GDAL/OGR.
+
+    Raises:
+        ValueError: If the backend is not one of `BACKENDS`.
+    """
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Expected one of {BACKENDS}.")
+    _backend = backend
 
 
 def load_raster(path: str, layer_name: str):
     """
     Loads a raster file as a QgsRasterLayer.
 
+    With the "gdal" backend (see `set_backend`) a GdalRasterLayer is returned instead.
+
     Args:
         path (str): The file path to the raster file.
         layer_name (str): The name to assign to the loaded raster layer.
@@ -18,7 +43,12 @@ def load_raster(path: str, layer_name: str):
     Prints:
         Confirmation message indicating successful loading of the raster layer.
     """
-    layer = QgsRasterLayer(path, layer_name)
+    if _backend == "gdal":
+        layer = GdalRasterLayer(path, layer_name)
+    else:
+        from qgis.core import QgsRasterLayer
+
+        layer = QgsRasterLayer(path, layer_name)
     if not layer.isValid():
         raise Exception(f"Failed to load raster: {layer_name}")
     print(f"{layer_name} loaded.")
@@ -29,6 +59,8 @@ def load_flood_points(path: str, layer_name: str):
     """
     Loads a vector layer of flood points using the specified file path and layer name.
 
+    With the "gdal" backend (see `set_backend`) an OgrVectorLayer is returned instead.
+
     Args:
         path (str): The file path to the vector data source.
         layer_name (str): The name to assign to the loaded layer.
@@ -42,8 +74,152 @@ def load_flood_points(path: str, layer_name: str):
     Prints:
         Confirmation message indicating successful loading of the layer.
     """
-    layer = QgsVectorLayer(path, layer_name, "ogr")
+    if _backend == "gdal":
+        layer = OgrVectorLayer(path, layer_name)
+    else:
+        from qgis.core import QgsVectorLayer
+
+        layer = QgsVectorLayer(path, layer_name, "ogr")
     if not layer.isValid():
         raise Exception(f"Failed to load vector: {layer_name}")
     print(f"{layer_name} loaded.")
     return layer
+
+
+class GdalRasterLayer:
+    """
+    A raster layer read with GDAL, exposing the subset of the QgsRasterLayer API used by this package.
+    """
+
+    def __init__(self, path, layer_name):
+        self._path = path
+        self._name = layer_name
+        dataset = _try_call(gdal.OpenEx, path, gdal.OF_RASTER | gdal.OF_READONLY)
+        self._valid = dataset is not None
+        if not self._valid:
+            return
+
+        x_origin, pixel_width, _, y_origin, _, pixel_height = dataset.GetGeoTransform()
+        self._width = dataset.RasterXSize
+        self._height = dataset.RasterYSize
+        self._pixel_size = (abs(pixel_width), abs(pixel_height))
+        self._extent = _Extent(
+            x_origin,
+            y_origin + pixel_height * self._height,
+            x_origin + pixel_width * self._width,
+            y_origin,
+        )
+        self._crs = _Crs(dataset.GetProjection())
+        self._provider = _RasterProvider(dataset)
+
+    def isValid(self):
+        return self._valid
+
+    def name(self):
+        return self._name
+
+    def source(self):
+        return self._path
+
+    def extent(self):
+        return self._extent
+
+    def crs(self):
+        return self._crs
+
+    def dataProvider(self):
+        return self._provider
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def rasterUnitsPerPixelX(self):
+        return self._pixel_size[0]
+
+    def rasterUnitsPerPixelY(self):
+        return self._pixel_size[1]
+
+
+class OgrVectorLayer:
+    """
+    A vector layer read with OGR, exposing the subset of the QgsVectorLayer API used by this package.
+    """
+
+    def __init__(self, path, layer_name):
+        self._path = path
+        self._name = layer_name
+        self._valid = _try_call(ogr.Open, path) is not None
+
+    def isValid(self):
+        return self._valid
+
+    def name(self):
+        return self._name
+
+    def source(self):
+        return self._path
+
+
+class _Extent:
+    """
+    The bounding box of a GdalRasterLayer, mirroring QgsRectangle's accessors.
+    """
+
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self._bounds = (xmin, ymin, xmax, ymax)
+
+    def xMinimum(self):
+        return self._bounds[0]
+
+    def yMinimum(self):
+        return self._bounds[1]
+
+    def xMaximum(self):
+        return self._bounds[2]
+
+    def yMaximum(self):
+        return self._bounds[3]
+
+
+class _Crs:
+    """
+    The CRS of a GdalRasterLayer, mirroring QgsCoordinateReferenceSystem.authid().
+    """
+
+    def __init__(self, wkt):
+        self._authid = ""
+        if wkt:
+            srs = osr.SpatialReference()
+            srs.ImportFromWkt(wkt)
+            _try_call(srs.AutoIdentifyEPSG)
+            name, code = srs.GetAuthorityName(None), srs.GetAuthorityCode(None)
+            # Without an authority code fall back to the WKT, which GDAL accepts wherever an SRS is expected
+            self._authid = f"{name}:{code}" if name and code else wkt
+
+    def authid(self):
+        return self._authid
+
+
+class _RasterProvider:
+    """
+    The band metadata of a GdalRasterLayer, mirroring QgsRasterDataProvider.sourceNoDataValue().
+    """
+
+    def __init__(self, dataset):
+        self._nodata = [dataset.GetRasterBand(i + 1).GetNoDataValue() for i in range(dataset.RasterCount)]
+
+    def sourceNoDataValue(self, band):
+        return self._nodata[band - 1]
+
+
+def _try_call(opener, *args):
+    """
+    Calls a GDAL, OGR, or OSR function, returning None on failure whether or not GDAL exceptions are enabled.
+    """
+    try:
+        return opener(*args)
+    except RuntimeError:
+        return None
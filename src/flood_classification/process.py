@@ -1,114 +1,213 @@
+import functools
+import hashlib
+import math
+import os
+import sys
+import threading
+
 import numpy as np
 import pandas as pd
-from osgeo import gdal, gdalconst
-from qgis.core import QgsRasterLayer
+from osgeo import gdal, gdalconst, ogr, osr
+from scipy.ndimage import distance_transform_edt
+from scipy.spatial import cKDTree
+
+from .load import load_raster
 
-from flood_classification import load_raster
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional, the KD-tree handles every layer without it
+    njit = None
 
 gdal.UseExceptions()
 
+# Shared settings for the resampling warps: use every core and a 1 GB warp buffer
+WARP_MEMORY_LIMIT = 1 << 30
+WARP_OPTIONS = ["NUM_THREADS=ALL_CPUS"]
+# Rasters are written as 512x512 tiles so later whole-block reads bypass the block cache
+TILED_CREATION_OPTIONS = [
+    "TILED=YES",
+    "BLOCKXSIZE=512",
+    "BLOCKYSIZE=512",
+    "COMPRESS=LZW",
+    "NUM_THREADS=ALL_CPUS",
+]
+WARP_CREATION_OPTIONS = [
+    "TILED=YES",
+    "BLOCKXSIZE=512",
+    "BLOCKYSIZE=512",
+    "COMPRESS=ZSTD",
+    "BIGTIFF=IF_SAFER",
+    "NUM_THREADS=ALL_CPUS",
+]
+
+POINT_GEOMETRY_TYPES = (ogr.wkbPoint, ogr.wkbMultiPoint)
+POLYGON_GEOMETRY_TYPES = (ogr.wkbPolygon, ogr.wkbMultiPolygon)
+
+# Column order of the arrays returned by create_final_array
+FEATURE_COLUMNS = ['dtm_value', 'lulc_code', 'flood_binary', 'dist_to_river', 'dist_to_tributaries', 'is_basin']
+
+# Below this many feature vertices a brute-force Numba scan is cheaper than building and querying a KD-tree
+NUMBA_MAX_VERTICES = 1000
+
+# Numba's default workqueue threading layer aborts the process when parallel kernels are launched from several
+# Python threads at once (as main does with its thread pool), so launches of the kernel are serialized
+_DISTANCE_KERNEL_LOCK = threading.Lock()
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _distance_kernel(xs, ys, fx, fy, out):
+        """
+        Writes to `out[i]` the Euclidean distance from point (xs[i], ys[i]) to the nearest point of (fx, fy).
+        """
+        for i in prange(xs.size):
+            dmin = 1e300
+            for j in range(fx.size):
+                dx = xs[i] - fx[j]
+                dy = ys[i] - fy[j]
+                d = dx * dx + dy * dy
+                if d < dmin:
+                    dmin = d
+            out[i] = np.sqrt(dmin)
+else:
+    _distance_kernel = None
+
+
+def configure_gdal(cache_max_mb=1024, vsi_cache_size=256 * 1024 * 1024):
+    """
+    Tunes GDAL's global configuration for the pipeline. Call it once at startup, after QGIS is initialized
+    (QGIS sets its own GDAL options during init) and before any raster is read.
+
+    Args:
+        cache_max_mb (int, optional): The size of GDAL's raster block cache in megabytes; GDAL's default is
+            often too small to keep the blocks of every raster read window by window by the export.
+        vsi_cache_size (int, optional): The size in bytes of the cache for reads through GDAL's virtual file system.
+    """
+    gdal.SetConfigOption("GDAL_CACHEMAX", str(cache_max_mb))
+    gdal.SetConfigOption("VSI_CACHE", "TRUE")
+    gdal.SetConfigOption("VSI_CACHE_SIZE", str(vsi_cache_size))
+    # Let drivers (de)compress and warp on every core
+    gdal.SetConfigOption("GDAL_NUM_THREADS", "ALL_CPUS")
+    # Do not list the directory of every opened raster; sidecars (.aux.xml, .ovr, .msk, world files, .prj)
+    # are still found by probing for them by name, so their NoData, CRS, and overviews are kept
+    gdal.SetConfigOption("GDAL_DISABLE_READDIR_ON_OPEN", "TRUE")
+    # Keep GeoTIFF masks inside the file instead of .msk sidecars
+    gdal.SetConfigOption("GDAL_TIFF_INTERNAL_MASK", "YES")
+
+
 def check_resolution_and_crs(
     raster1, raster2, path_raster1, path_raster2, resampled_path1, resampled_path2, target_resolution
 ):
     """
     Checks if two raster datasets have matching coordinate reference systems (CRS) and spatial resolutions.
-    If the CRS do not match, raises a ValueError. If the resolutions differ, resamples the raster with higher resolution
-    to match the lower resolution raster using GDAL's Warp function, and reloads the resampled raster.
+    Both rasters are resampled to the target resolution on the grid of the first raster with a single direct
+    `gdal.Warp` call each, which also reprojects the second raster if its CRS differs, and then reloaded.
+    A raster that already has the target CRS, resolution, and aligned extent is returned unchanged, and one in
+    the target CRS whose pixels evenly divide the target resolution is wrapped in a lazy VRT that aggregates
+    them on read, instead of being warped into a new GeoTIFF.
 
     Args:
         raster1: The first raster object, expected to have methods for CRS, resolution, and extent.
         raster2: The second raster object, expected to have methods for CRS, resolution, and extent.
         path_raster1 (str): File path to the first raster.
         path_raster2 (str): File path to the second raster.
-        resampled_path1 (str): File path where the first resampled raster will be saved.
-        resampled_path2 (str): File path where the second resampled raster will be saved.
+        resampled_path1 (str): File path where the first resampled raster will be saved; a hash of the
+            warp inputs is appended to the file name.
+        resampled_path2 (str): File path where the second resampled raster will be saved, also hashed.
         target_resolution (float): The desired output resolution in meters.
 
     Returns:
         tuple: A tuple (raster1, raster2), where one or both rasters may have been resampled to ensure matching CRS and resolution.
-
-    Raises:
-        ValueError: If the CRS of the two rasters do not match.
     """
     crs1 = raster1.crs().authid()
     crs2 = raster2.crs().authid()
 
-    # Step 1: Check and handle CRS mismatch
+    # Step 1: Check for a CRS mismatch; the reprojection itself happens in the single resampling warp below
     if crs1 != crs2:
         print(f"CRS mismatch detected: {crs1} vs {crs2}. Reprojecting raster2 to match raster1.")
-        
-        # Use GDAL to reproject the second raster to the first's CRS
-        temp_reprojected_path = "temp/reprojected_lulc_temp.tif"
-        gdal.Warp(
-            temp_reprojected_path,
-            path_raster2,
-            options=gdal.WarpOptions(
-                format="GTiff",
-                srcSRS=crs2,
-                dstSRS=crs1,
-                outputType=gdal.GDT_Float32,
-                resampleAlg=gdal.GRIORA_Bilinear,
-                srcNodata=raster2.dataProvider().sourceNoDataValue(1),
-                dstNodata=raster1.dataProvider().sourceNoDataValue(1)
-            )
-        )
-        # Reload raster2 to get the updated CRS
-        path_raster2 = temp_reprojected_path
-        raster2 = load_raster(path_raster2, "reprojected_lulc")
 
     print("CRS check finished.")
 
-    # Step 2: Resample both rasters to the target resolution
-    print(f"Resampling both rasters to {target_resolution}m resolution.")
-    
-    # Resample the first raster
-    gdal.Warp(
-        resampled_path1,
-        path_raster1,
-        options=gdal.WarpOptions(
-            xRes=target_resolution,
-            yRes=target_resolution,
-            targetAlignedPixels=True,
-            dstSRS=raster1.crs().authid(),
-            resampleAlg="bilinear",
-            format="GTiff",
-            outputBounds=(
-                raster1.extent().xMinimum(),
-                raster1.extent().yMinimum(),
-                raster1.extent().xMaximum(),
-                raster1.extent().yMaximum(),
-            ),
-        )
-    )
+    # Step 2: Resample each raster to the target resolution, unless it already lies on the target grid.
+    # Warp outputs are named after a hash of their inputs, so reruns with unchanged inputs reuse them.
+    target_bounds = _aligned_bounds(raster1.extent(), target_resolution)
 
-    # Resample the second raster
-    gdal.Warp(
-        resampled_path2,
-        path_raster2,
-        options=gdal.WarpOptions(
-            xRes=target_resolution,
-            yRes=target_resolution,
-            targetAlignedPixels=True,
-            dstSRS=raster2.crs().authid(),
-            resampleAlg="near",
-            format="GTiff",
-            outputBounds=(
-                raster2.extent().xMinimum(),
-                raster2.extent().yMinimum(),
-                raster2.extent().xMaximum(),
-                raster2.extent().yMaximum(),
-            ),
+    if _is_on_grid(raster1, crs1, target_bounds, target_resolution):
+        print(f"Raster1 already matches the {target_resolution}m target grid, skipping resample.")
+    elif _is_integer_downsample(raster1, crs1, target_resolution):
+        print(f"Aggregating raster1 to {target_resolution}m resolution through a VRT.")
+        raster1 = _build_resampled_vrt(
+            resampled_path1, path_raster1, target_resolution, target_bounds, "average", "resampled_raster1"
         )
-    )
+    else:
+        resampled_path1 = _cached_path(
+            resampled_path1, path_raster1, target_resolution, "bilinear", target_bounds, crs1
+        )
+        if os.path.exists(resampled_path1):
+            print(f"Reusing resampled raster1 from {resampled_path1}.")
+        else:
+            print(f"Resampling raster1 to {target_resolution}m resolution.")
+            _warp_atomically(
+                resampled_path1,
+                path_raster1,
+                gdal.WarpOptions(
+                    xRes=target_resolution,
+                    yRes=target_resolution,
+                    targetAlignedPixels=True,
+                    dstSRS=crs1,
+                    resampleAlg="bilinear",
+                    format="GTiff",
+                    multithread=True,
+                    warpMemoryLimit=WARP_MEMORY_LIMIT,
+                    warpOptions=WARP_OPTIONS,
+                    creationOptions=WARP_CREATION_OPTIONS,
+                    outputBounds=target_bounds,
+                ),
+            )
+        raster1 = load_raster(resampled_path1, "resampled_raster1")
 
-    raster1 = load_raster(resampled_path1, "resampled_raster1")
-    raster2 = load_raster(resampled_path2, "resampled_raster2")
+    # The second raster is reprojected and resampled onto the first raster's grid in one pass so both
+    # share the same pixels. LULC is categorical, so each output pixel takes the most frequent class.
+    if _is_on_grid(raster2, crs1, target_bounds, target_resolution):
+        print(f"Raster2 already matches the {target_resolution}m target grid, skipping resample.")
+    elif _is_integer_downsample(raster2, crs1, target_resolution):
+        print(f"Aggregating raster2 to {target_resolution}m resolution through a VRT.")
+        raster2 = _build_resampled_vrt(
+            resampled_path2, path_raster2, target_resolution, target_bounds, "mode", "resampled_raster2"
+        )
+    else:
+        resampled_path2 = _cached_path(
+            resampled_path2, path_raster2, target_resolution, "mode", target_bounds, crs2, crs1
+        )
+        if os.path.exists(resampled_path2):
+            print(f"Reusing resampled raster2 from {resampled_path2}.")
+        else:
+            print(f"Resampling raster2 to {target_resolution}m resolution.")
+            _warp_atomically(
+                resampled_path2,
+                path_raster2,
+                gdal.WarpOptions(
+                    xRes=target_resolution,
+                    yRes=target_resolution,
+                    targetAlignedPixels=True,
+                    srcSRS=crs2,
+                    dstSRS=crs1,
+                    resampleAlg="mode",
+                    format="GTiff",
+                    multithread=True,
+                    warpMemoryLimit=WARP_MEMORY_LIMIT,
+                    warpOptions=WARP_OPTIONS,
+                    creationOptions=WARP_CREATION_OPTIONS,
+                    outputBounds=target_bounds,
+                ),
+            )
+        raster2 = load_raster(resampled_path2, "resampled_raster2")
 
     print("Resample finished.")
     return raster1, raster2
 
 
-def transform_to_raster(vector_layer, reference_raster, output_path, target_resolution):
+def transform_to_raster(vector_layer, reference_raster, output_path, target_resolution, return_array=False, out=None):
     """
     Converts a vector layer to a raster using the properties of a reference raster and a fixed resolution.
 
@@ -120,11 +219,15 @@ def transform_to_raster(vector_layer, reference_raster, output_path, target_reso
     Args:
         vector_layer: The vector layer to be rasterized.
         reference_raster: The reference raster whose extent and CRS will be used.
-        output_path (str): The file path where the output raster will be saved.
+        output_path (str): The file path where the output raster will be saved. Unused when `return_array` is True.
         target_resolution (float): The desired output resolution in the units of the CRS.
+        return_array (bool, optional): If True, rasterize in memory and return the values instead of a layer.
+        out (np.ndarray, optional): With `return_array`, a preallocated float32 array of shape (height, width)
+            that receives the values.
 
     Returns:
-        RasterLayer: The loaded raster layer created from the rasterized vector data.
+        RasterLayer or np.ndarray: The loaded raster layer created from the rasterized vector data, or, if
+            `return_array` is True, a float32 array of shape (height, width) with NoData replaced by np.nan.
 
     Raises:
         Exception: If rasterization fails or input parameters are invalid.
@@ -132,32 +235,80 @@ def transform_to_raster(vector_layer, reference_raster, output_path, target_reso
     Note:
         Requires GDAL and a compatible raster/vector data environment.
     """
-    gdal.Rasterize(
-        output_path,
-        vector_layer.source(),
-        options=gdal.RasterizeOptions(
-            format="GTiff",
-            outputType=gdal.GDT_Byte,
-            burnValues=[1],
-            noData=0,
-            initValues=[0],
-            xRes=target_resolution,
-            yRes=target_resolution,
-            outputBounds=(
-                reference_raster.extent().xMinimum(),
-                reference_raster.extent().yMinimum(),
-                reference_raster.extent().xMaximum(),
-                reference_raster.extent().yMaximum(),
-            ),
-            targetAlignedPixels=True,
-            outputSRS=reference_raster.crs().authid(),
-            creationOptions=["COMPRESS=LZW"],
-        ),
-    )
+    if return_array:
+        output_ds = _rasterize_vector(
+            vector_layer, reference_raster, "", nodata=0, init_value=0, driver_name="MEM"
+        )
+        print("Point transformed to raster.")
+        return _read_values(output_ds, out=out)
+
+    _rasterize_vector(vector_layer, reference_raster, output_path, nodata=0, init_value=0)
     print("Point transformed to raster.")
     return load_raster(output_path, "flood_raster")
 
 
+def raster_to_values(raster_layer, out=None, mmap=False):
+    """
+    Reads the first band of a raster layer into a 2D NumPy array.
+
+    Parameters:
+        raster_layer (QgsRasterLayer): The raster layer to read.
+        out (numpy.ndarray, optional): A preallocated float32 array of shape (height, width) to read into,
+            so repeated reads of same-sized rasters reuse one buffer instead of allocating a new one.
+        mmap (bool, optional): If True and the raster is an uncompressed, stripped float32 GeoTIFF stored
+            contiguously in native byte order, map the file into memory instead of reading it. The map is
+            copy-on-write, so only pages holding NoData are copied and the file is never modified.
+            Other rasters fall back to a regular read. When `out` is also given, the mapped band is copied
+            into `out` and `out` is returned, so the caller's buffer is always filled.
+
+    Returns:
+        numpy.ndarray: A float32 array of shape (height, width) with NoData replaced by np.nan.
+
+    Raises:
+        ValueError: If `out` is not a C-contiguous float32 array of the raster's shape.
+    """
+    nodata = raster_layer.dataProvider().sourceNoDataValue(1)
+
+    dataset = _open_raster(raster_layer)
+    values = _memmap_band(dataset) if mmap else None
+    if values is None:
+        values = _read_values(dataset, nodata, out=out)
+    else:
+        if out is not None:
+            # The caller expects its buffer to be filled, e.g. one plane of a buffer shared by all layers
+            _output_array(values.shape, out)[...] = values
+            values = out
+        if nodata is not None:
+            values[values == nodata] = np.nan
+    dataset = None
+
+    return values
+
+
+def compute_grid_xy(raster_layer):
+    """
+    Computes the coordinates of every pixel center of a raster layer.
+
+    Rasters aligned by `check_resolution_and_crs` share the same grid, so the arrays are cached and reused
+    across layers. They are read-only; copy them before modifying.
+
+    Parameters:
+        raster_layer (QgsRasterLayer): The raster layer whose grid is used.
+
+    Returns:
+        tuple: Two float64 arrays (x, y) of shape (height, width) with the pixel center coordinates.
+    """
+    extent = raster_layer.extent()
+    return _grid_xy(
+        extent.xMinimum(),
+        extent.yMaximum(),
+        raster_layer.width(),
+        raster_layer.height(),
+        raster_layer.rasterUnitsPerPixelX(),
+        -raster_layer.rasterUnitsPerPixelY(),
+    )
+
+
 def raster_to_dataframe(raster_layer):
     """
     Converts a raster layer to a pandas DataFrame with pixel values and their corresponding spatial coordinates.
@@ -170,200 +321,748 @@ def raster_to_dataframe(raster_layer):
             - 'value': The raster pixel value (with NoData replaced by np.nan).
             - 'x': The x-coordinate of the pixel center.
             - 'y': The y-coordinate of the pixel center.
+            - 'pixel_id': The row-major pixel index (row * width + col), an exact integer join key.
     """
-    
-    provider = raster_layer.dataProvider()
-    nodata = provider.sourceNoDataValue(1)
+    values = raster_to_values(raster_layer)
+    x_coords, y_coords = compute_grid_xy(raster_layer)
 
-    extent = raster_layer.extent()
-    width = raster_layer.width()
-    height = raster_layer.height()
-    block = provider.block(1, extent, width, height)
+    df = pd.DataFrame({
+        "value": values.ravel(),
+        "x": x_coords.ravel(),
+        "y": y_coords.ravel(),
+        "pixel_id": np.arange(values.size, dtype=np.int64),
+    })
 
-    array_2d = np.array(
-        [[block.value(x, y) for x in range(width)] for y in range(height)]
-    )
+    return df
 
-    flat_array = array_2d.flatten()
+def create_final_dataframe(dtm_df, lulc_df, flood_df, river_df, tributaries_df, basin_df, basin_only=False):
+    """
+    Combines DTM, LULC, Flood, River, Tributaries, and Basin DataFrames into a single DataFrame.
 
-    if nodata is not None:
-        flat_array = np.where(np.isclose(flat_array, nodata), np.nan, flat_array)
+    All rasters are expected to share the grid of the DTM (as produced by `check_resolution_and_crs` and the
+    rasterization helpers), so the value columns are aligned on the integer `pixel_id` instead of being
+    joined on the float (x, y) coordinates.
+    Every feature other than the DTM may also be passed as a value array on that grid, such as the ones
+    returned by `raster_to_values` or `calculate_distance_to_features(..., return_array=True)`.
 
-    x_origin = extent.xMinimum()
-    y_origin = extent.yMaximum()
-    pixel_width = raster_layer.rasterUnitsPerPixelX()
-    pixel_height = raster_layer.rasterUnitsPerPixelY()
+    Args:
+        dtm_df (pd.DataFrame): DataFrame containing DTM data.
+        lulc_df (pd.DataFrame or np.ndarray): DataFrame containing LULC data.
+        flood_df (pd.DataFrame or np.ndarray): DataFrame containing Flood data.
+        river_df (pd.DataFrame or np.ndarray): DataFrame containing river distance data.
+        tributaries_df (pd.DataFrame or np.ndarray): DataFrame containing tributaries distance data.
+        basin_df (pd.DataFrame or np.ndarray): DataFrame containing basin membership data.
+        basin_only (bool, optional): If True, also drop pixels outside the basin. The `pixel_id` of the
+            remaining rows still locates them on the grid.
 
-    x_coords = np.array(
-        [x_origin + (i % width) * pixel_width for i in range(width * height)]
-    )
+    Returns:
+        pd.DataFrame: A single DataFrame with all features and the `pixel_id`, `x`, and `y` of each pixel.
 
-    y_coords = np.array(
-        [y_origin - (i // width) * pixel_height for i in range(width * height)]
-    )
+    Raises:
+        ValueError: If a value array does not have the same number of pixels as the DTM.
+    """
+    features = [lulc_df, flood_df, river_df, tributaries_df, basin_df]
+    if any(not isinstance(f, pd.DataFrame) and np.size(f) != len(dtm_df) for f in features):
+        raise ValueError("All rasters must share the same grid to build the final DataFrame.")
 
-    df = pd.DataFrame({"value": flat_array, "x": x_coords, "y": y_coords})
+    # Every raster indexes its pixels the same way, so the columns are aligned on a single int64 key.
+    # When the indexes are identical pandas reuses the values without performing a join.
+    dtm_df = dtm_df.set_index('pixel_id')
+    columns = {'dtm_value': dtm_df['value'].to_numpy()}
+    for feature, name in zip(features, FEATURE_COLUMNS[1:]):
+        columns[name] = _feature_column(feature, name, dtm_df.index).to_numpy()
 
+    # A value of NaN in flood or basin means no flood or not in the basin, so fill with 0
+    for name in ('flood_binary', 'is_basin'):
+        columns[name] = np.nan_to_num(columns[name], nan=0)
 
-    return df
+    pixel_ids = _valid_pixels(columns['dtm_value'], columns['lulc_code'], columns['is_basin'], basin_only)
 
-def create_final_dataframe(dtm_df, lulc_df, flood_df, river_df, tributaries_df, basin_df):
+    # Build the DataFrame once from one flat array per column (structure of arrays), so pandas adopts
+    # each array as its own block instead of copying a stacked 2D array column by column.
+    # Discrete features are stored in compact dtypes and continuous ones in single precision.
+    final_df = pd.DataFrame({
+        'pixel_id': dtm_df.index.to_numpy()[pixel_ids],
+        'dtm_value': columns['dtm_value'][pixel_ids].astype(np.float32, copy=False),
+        'lulc_code': pd.Categorical(columns['lulc_code'][pixel_ids]),
+        'flood_binary': columns['flood_binary'][pixel_ids].astype(np.uint8),
+        'dist_to_river': columns['dist_to_river'][pixel_ids].astype(np.float32, copy=False),
+        'dist_to_tributaries': columns['dist_to_tributaries'][pixel_ids].astype(np.float32, copy=False),
+        'is_basin': columns['is_basin'][pixel_ids].astype(np.uint8),
+        'x': dtm_df['x'].to_numpy()[pixel_ids],
+        'y': dtm_df['y'].to_numpy()[pixel_ids],
+    }, copy=False)
+
+    return final_df
+
+
+def create_final_array(
+    dtm, lulc, flood, river, tributaries, basin, return_pixel_ids=False, basin_only=False
+):
     """
-    Merges DTM, LULC, Flood, River, and Microbasin DataFrames into a single DataFrame.
+    Stacks the six feature rasters into a single (n_pixels, 6) float32 array for model training or inference.
+
+    The columns follow `FEATURE_COLUMNS`. As in `create_final_dataframe`, NaN flood and basin values are
+    treated as 0, and pixels without a DTM or LULC value are left out.
 
     Args:
-        dtm_df (pd.DataFrame): DataFrame containing DTM data.
-        lulc_df (pd.DataFrame): DataFrame containing LULC data.
-        flood_df (pd.DataFrame): DataFrame containing Flood data.
-        river_df (pd.DataFrame): DataFrame containing river distance data.
+        dtm (np.ndarray): DTM values, e.g. from `raster_to_values`.
+        lulc (np.ndarray): LULC codes on the same grid.
+        flood (np.ndarray): Binary flood values on the same grid.
+        river (np.ndarray): Distances to the river on the same grid.
+        tributaries (np.ndarray): Distances to the tributaries on the same grid.
+        basin (np.ndarray): Binary basin membership on the same grid.
+        return_pixel_ids (bool, optional): If True, also return the row-major index of every kept pixel.
+        basin_only (bool, optional): If True, keep only pixels inside the basin, as in `create_final_dataframe`.
 
     Returns:
-        pd.DataFrame: A single DataFrame with all features.
-    """
-    # Rename value columns to their final names before merging to avoid conflicts.
-    dtm_df = dtm_df.rename(columns={'value': 'dtm_value'})
-    lulc_df = lulc_df.rename(columns={'value': 'lulc_code'})
-    flood_df = flood_df.rename(columns={'value': 'flood_binary'})
-    river_df = river_df.rename(columns={'value': 'dist_to_river'})
-    tributaries_df = tributaries_df.rename(columns={'value': 'dist_to_tributaries'})
-    basin_df = basin_df.rename(columns={'value': 'is_basin'})
-
-    # Start with DTM and merge the other DataFrames sequentially.
-    final_df = dtm_df
-    final_df = pd.merge(final_df, lulc_df, on=['x', 'y'], how='outer')
-    final_df = pd.merge(final_df, flood_df, on=['x', 'y'], how='outer')
-    final_df = pd.merge(final_df, river_df, on=['x', 'y'], how='outer')
-    final_df = pd.merge(final_df, tributaries_df, on=['x', 'y'], how='outer')
-    final_df = pd.merge(final_df, basin_df, on=['x', 'y'], how='outer')
-
-    # A value of NaN in 'flood_binary' or 'is_microbacin' means no flood or not in a microbasin, so fill with 0
-    final_df['flood_binary'] = final_df['flood_binary'].fillna(0)
-    final_df['is_basin'] = final_df['is_basin'].fillna(0)
-    
-    # Drop rows where any of the core data columns are NaN to ensure consistency
-    final_df.dropna(subset=['dtm_value', 'lulc_code'], how='any', inplace=True)
-    
-    return final_df
+        np.ndarray or tuple: The (n_valid, 6) feature array, and the int64 pixel ids if `return_pixel_ids`.
 
+    Raises:
+        ValueError: If the inputs do not all have the same number of pixels.
+    """
+    layers = [np.ravel(layer) for layer in (dtm, lulc, flood, river, tributaries, basin)]
+    if len({layer.size for layer in layers}) != 1:
+        raise ValueError("All rasters must share the same grid to build the final array.")
+
+    stacked = np.stack(layers, axis=-1).astype(np.float32, copy=False)
+
+    # A value of NaN in flood or basin means no flood or not in the basin, so fill with 0
+    for column in (2, 5):
+        band = stacked[:, column]
+        band[np.isnan(band)] = 0
+
+    pixel_ids = _valid_pixels(stacked[:, 0], stacked[:, 1], stacked[:, 5], basin_only)
+    features = stacked[pixel_ids]
 
-def calculate_distance_to_features(vector_layer, reference_raster, output_path, target_resolution):
+    if return_pixel_ids:
+        return features, pixel_ids
+    return features
+
+
+def _valid_pixels(dtm, lulc, basin, basin_only=False):
+    """
+    Returns the flat indices of the pixels kept in the final dataset.
+
+    Pixels where any of the core data columns (DTM, LULC) are NaN are dropped to ensure consistency, and
+    with `basin_only` so are pixels outside the basin.
+
+    Args:
+        dtm (np.ndarray): Flat DTM values.
+        lulc (np.ndarray): Flat LULC codes.
+        basin (np.ndarray): Flat binary basin membership, with NaN already filled with 0.
+        basin_only (bool, optional): If True, keep only pixels inside the basin.
+
+    Returns:
+        np.ndarray: The int64 indices of the kept pixels, in ascending order.
+    """
+    mask = ~np.isnan(dtm) & ~np.isnan(lulc)
+    if basin_only:
+        mask &= basin == 1
+    return np.flatnonzero(mask)
+
+
+def calculate_distance_to_features(
+    vector_layer, reference_raster, output_path, target_resolution, return_array=False, out=None
+):
     """
     Calculates the distance from each pixel to the nearest feature in a vector layer.
 
     Args:
         vector_layer: The vector layer containing the features (e.g., rivers).
         reference_raster: The raster used for extent and CRS.
-        output_path (str): The file path for the output distance raster.
+        output_path (str): The file path for the output distance raster. Unused when `return_array` is True.
         target_resolution (float): The desired output resolution in meters.
+        return_array (bool, optional): If True, skip writing the raster and return the distances directly.
+        out (np.ndarray, optional): With `return_array`, a preallocated C-contiguous float32 array of shape
+            (height, width) that receives the distances, e.g. one plane of a buffer shared by all layers.
 
     Returns:
-        QgsRasterLayer: The loaded raster layer with distance values.
+        QgsRasterLayer or np.ndarray: The loaded raster layer with distance values, or, if `return_array`
+            is True, a float32 array of shape (height, width) with NoData replaced by np.nan.
     """
     print(f"Calculating distance to features in layer: {vector_layer.name()}")
+    if not return_array:
+        out = None
     
     # Use a consistent NoData value for all raster operations
     NODATA_VALUE = -9999.0
 
-    # Step 1: Create an empty raster to serve as a base for the distance calculation
-    empty_raster_path = "temp/empty_raster.tif"
-    gdal.Rasterize(
-        empty_raster_path,
-        vector_layer.source(),
-        options=gdal.RasterizeOptions(
-            format="GTiff",
-            outputType=gdal.GDT_Byte,
-            burnValues=[1],
-            noData=0,
-            xRes=target_resolution,
-            yRes=target_resolution,
-            outputBounds=(
-                reference_raster.extent().xMinimum(),
-                reference_raster.extent().yMinimum(),
-                reference_raster.extent().xMaximum(),
-                reference_raster.extent().yMaximum(),
-            ),
-            targetAlignedPixels=True,
-            outputSRS=reference_raster.crs().authid(),
-            creationOptions=["COMPRESS=LZW"],
-        )
-    )
+    if _vector_geometry_type(vector_layer) not in POLYGON_GEOMETRY_TYPES:
+        # Points and lines: query every pixel center against the feature vertices (densified to the pixel
+        # spacing) with a KD-tree, an O(N log F) nearest-neighbour search instead of a raster proximity sweep.
+        # Small layers use the parallel Numba kernel instead, when Numba is installed.
+        reference_ds = _open_raster(reference_raster)
+        xs, ys = _read_vertices(vector_layer, spacing=target_resolution, reference_ds=reference_ds, clip=False)
+        grid_x, grid_y = _pixel_centers(reference_ds)
 
-    # Step 2: Open the newly created raster file and get the raster band
-    input_ds = gdal.Open(empty_raster_path, gdalconst.GA_ReadOnly)
-    if input_ds is None:
-        raise IOError(f"Could not open file: {empty_raster_path}")
-    input_band = input_ds.GetRasterBand(1)
-    
-    # Step 3: Create the output raster dataset
-    driver = gdal.GetDriverByName("GTiff")
-    output_ds = driver.Create(
-        output_path, 
-        input_band.XSize, 
-        input_band.YSize, 
-        1, 
-        gdal.GDT_Float32
-    )
-    if output_ds is None:
-        raise IOError(f"Could not create file: {output_path}")
+        distances = _output_array(grid_x.shape, out)
+        if xs.size == 0:
+            distances.fill(NODATA_VALUE)
+        elif _distance_kernel is not None and xs.size < NUMBA_MAX_VERTICES:
+            with _DISTANCE_KERNEL_LOCK:
+                _distance_kernel(grid_x.ravel(), grid_y.ravel(), xs, ys, distances.ravel())
+        else:
+            tree = cKDTree(np.column_stack([xs, ys]))
+            nearest, _ = tree.query(np.column_stack([grid_x.ravel(), grid_y.ravel()]), k=1, workers=-1)
+            distances[...] = nearest.reshape(grid_x.shape)
 
-    # Set projection and geotransform from the input raster
-    output_ds.SetProjection(input_ds.GetProjection())
-    output_ds.SetGeoTransform(input_ds.GetGeoTransform())
-    
-    output_band = output_ds.GetRasterBand(1)
-    output_band.SetNoDataValue(NODATA_VALUE)
-
-    # Step 4: Call ComputeProximity with both input and output bands
-    gdal.ComputeProximity(
-        input_band,
-        output_band,
-        options=["DISTUNITS=GEO", "MAXDIST=1000000", "NODATA=-9999"],
+        if return_array:
+            distances[distances == NODATA_VALUE] = np.nan
+            return distances
+
+        _write_array(distances, reference_ds, output_path, gdal.GDT_Float32, NODATA_VALUE)
+        return load_raster(output_path, "distance_raster")
+
+    # Polygons: pixels inside the features must be at distance 0, so rasterize them and run an exact
+    # Euclidean distance transform over the mask
+    # Step 1: Rasterize the features into an in-memory dataset on the reference grid
+    input_ds = _rasterize_vector(
+        vector_layer, reference_raster, "", nodata=0, driver_name="MEM"
     )
+    mask = input_ds.GetRasterBand(1).ReadAsArray() > 0
+
+    # Step 2: Measure the distance from every pixel center to the nearest feature pixel, in georeferenced
+    # units, with SciPy's C implementation instead of GDAL's proximity sweep
+    distances = _output_array(mask.shape, out)
+    if mask.any():
+        _, pixel_width, _, _, _, pixel_height = input_ds.GetGeoTransform()
+        distances[...] = distance_transform_edt(~mask, sampling=(abs(pixel_height), abs(pixel_width)))
+    else:
+        distances.fill(NODATA_VALUE)
+
+    if return_array:
+        distances[distances == NODATA_VALUE] = np.nan
+        return distances
 
-    # Step 5: Close the datasets to release file locks
+    # Step 3: Write the result to disk in a single pass and close the dataset to release file locks
+    _write_array(distances, input_ds, output_path, gdal.GDT_Float32, NODATA_VALUE)
     input_ds = None
-    output_ds = None
 
-    return QgsRasterLayer(output_path, "distance_raster")
+    return load_raster(output_path, "distance_raster")
 
 
-def transform_vector_to_binary_raster(vector_layer, reference_raster, output_path, target_resolution):
+def transform_vector_to_binary_raster(
+    vector_layer, reference_raster, output_path, target_resolution, return_array=False, out=None
+):
     """
     Converts a vector layer to a binary raster (1 for feature, 0 for no feature).
 
     Args:
         vector_layer: The vector layer to be rasterized.
         reference_raster: The raster used for extent and CRS.
-        output_path (str): The file path for the output binary raster.
+        output_path (str): The file path for the output binary raster. Unused when `return_array` is True.
         target_resolution (float): The desired output resolution in meters.
+        return_array (bool, optional): If True, rasterize in memory and return the values instead of a layer.
+        out (np.ndarray, optional): With `return_array`, a preallocated float32 array of shape (height, width)
+            that receives the values.
 
     Returns:
-        RasterLayer: The loaded binary raster layer.
+        RasterLayer or np.ndarray: The loaded binary raster layer, or, if `return_array` is True, a float32
+            array of shape (height, width) with NoData replaced by np.nan.
     """
     print(f"Rasterizing vector layer '{vector_layer.name()}' to binary format.")
-    nodata = reference_raster.dataProvider().sourceNoDataValue(1)
+    # Every pixel is either 0 or 1, so the Byte raster has no NoData; the DTM's sentinel would not fit it anyway
+    nodata = None
+
+    if return_array:
+        output_ds = _rasterize_vector(
+            vector_layer, reference_raster, "", nodata=nodata, init_value=0, driver_name="MEM"
+        )
+        print("Vector layer successfully rasterized.")
+        return _read_values(output_ds, out=out)
     
-    gdal.Rasterize(
-        output_path,
-        vector_layer.source(),
-        options=gdal.RasterizeOptions(
-            format="GTiff",
-            outputType=gdal.GDT_Byte,
-            burnValues=[1],
-            noData=nodata,
-            initValues=[0],
-            xRes=target_resolution,
-            yRes=target_resolution,
-            outputBounds=(
-                reference_raster.extent().xMinimum(),
-                reference_raster.extent().yMinimum(),
-                reference_raster.extent().xMaximum(),
-                reference_raster.extent().yMaximum(),
+    _rasterize_vector(vector_layer, reference_raster, output_path, nodata=nodata, init_value=0)
+    print("Vector layer successfully rasterized.")
+    return load_raster(output_path, "binary_raster")
+
+
+def _feature_column(feature, name, index):
+    """
+    Returns the values of a feature, given as a raster DataFrame or a value array, as a Series indexed by pixel_id.
+    """
+    if isinstance(feature, pd.DataFrame):
+        return feature.set_index('pixel_id')['value'].reindex(index).rename(name)
+    return pd.Series(np.ravel(feature), index=index, name=name)
+
+
+def _aligned_bounds(extent, resolution):
+    """
+    Expands an extent outwards to the nearest multiples of the resolution, as GDAL's targetAlignedPixels does.
+
+    Returns:
+        tuple: The aligned bounds as (xmin, ymin, xmax, ymax).
+    """
+    return (
+        math.floor(extent.xMinimum() / resolution) * resolution,
+        math.floor(extent.yMinimum() / resolution) * resolution,
+        math.ceil(extent.xMaximum() / resolution) * resolution,
+        math.ceil(extent.yMaximum() / resolution) * resolution,
+    )
+
+
+def _cached_path(output_path, source_path, *params):
+    """
+    Appends a hash of a source file (its path and modification time) and the warp parameters to a file name.
+
+    Returns:
+        str: The path `{root}_{hash}{ext}`, which only exists if the same inputs were already warped.
+    """
+    key = repr((os.path.abspath(source_path), os.path.getmtime(source_path)) + params)
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_{digest}{ext}"
+
+
+def _warp_atomically(output_path, source_path, options):
+    """
+    Runs `gdal.Warp` into a partial file and renames it when done, so an interrupted warp is never reused.
+    """
+    partial_path = output_path + ".part"
+    dataset = gdal.Warp(partial_path, source_path, options=options)
+    if dataset is None:
+        raise IOError(f"Could not create file: {output_path}")
+    dataset = None
+    os.replace(partial_path, output_path)
+
+
+def _is_on_grid(raster, crs, bounds, resolution, tolerance=1e-6):
+    """
+    Checks whether a raster already has the given CRS, pixel size, and bounds, so resampling it would be a no-op.
+    """
+    if raster.crs().authid() != crs:
+        return False
+    if not (
+        math.isclose(raster.rasterUnitsPerPixelX(), resolution, abs_tol=tolerance)
+        and math.isclose(raster.rasterUnitsPerPixelY(), resolution, abs_tol=tolerance)
+    ):
+        return False
+    extent = raster.extent()
+    raster_bounds = (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum())
+    return all(math.isclose(a, b, abs_tol=tolerance * resolution) for a, b in zip(raster_bounds, bounds))
+
+
+def _is_integer_downsample(raster, crs, resolution, tolerance=1e-6):
+    """
+    Checks whether a raster has the given CRS and a pixel size that divides the resolution a whole number of times.
+    """
+    if raster.crs().authid() != crs:
+        return False
+    factors = (resolution / raster.rasterUnitsPerPixelX(), resolution / raster.rasterUnitsPerPixelY())
+    return all(factor > 1 and math.isclose(factor, round(factor), abs_tol=tolerance) for factor in factors)
+
+
+def _build_resampled_vrt(output_path, source_path, resolution, bounds, resample_alg, layer_name):
+    """
+    Writes a VRT that presents a raster at a coarser resolution on the target bounds, and loads it.
+
+    No pixels are resampled here; GDAL aggregates the source pixels with `resample_alg` whenever the VRT is read.
+    """
+    vrt_path = _cached_path(os.path.splitext(output_path)[0] + ".vrt", source_path, resolution, resample_alg, bounds)
+    if not os.path.exists(vrt_path):
+        dataset = gdal.BuildVRT(
+            vrt_path,
+            [source_path],
+            options=gdal.BuildVRTOptions(
+                xRes=resolution,
+                yRes=resolution,
+                outputBounds=bounds,
+                resampleAlg=resample_alg,
             ),
-            targetAlignedPixels=True,
-            outputSRS=reference_raster.crs().authid(),
-            creationOptions=["COMPRESS=LZW"],
         )
+        if dataset is None:
+            raise IOError(f"Could not create file: {vrt_path}")
+        dataset = None
+    return load_raster(vrt_path, layer_name)
+
+
+def _rasterize_vector(
+    vector_layer, reference_raster, output_path, nodata, init_value=None,
+    driver_name="GTiff", creation_options=TILED_CREATION_OPTIONS,
+):
+    """
+    Burns the features of a vector layer with a value of 1 into a Byte raster aligned with a reference raster.
+
+    Point layers are burned directly with NumPy: the point coordinates are converted to pixel indices on the
+    reference grid and set in a single vectorized assignment, which avoids GDAL's generic rasterization loop.
+    Line and polygon layers are burned with one `gdal.RasterizeLayer` pass into a raster created on the
+    reference grid: a scanline fill that costs O(edges + pixels) rather than testing every pixel against every
+    polygon, and that shares the exact grid of the reference. Lines burn every pixel they touch, so thin
+    features are never skipped; polygons burn the pixels whose centers fall inside them.
+
+    Args:
+        vector_layer: The vector layer to be rasterized.
+        reference_raster: The raster whose grid (extent, resolution, and CRS) the output shares.
+        output_path (str): The file path where the output raster will be saved.
+        nodata (float or None): The NoData value of the output raster, or None (or NaN) for no NoData.
+        init_value (int, optional): The value used to initialize pixels not covered by any feature;
+            they are initialized to `nodata` (or 0 without one) when it is not given.
+        driver_name (str, optional): The GDAL driver of the output raster, e.g. "MEM" to keep it in memory.
+        creation_options (list, optional): GeoTIFF creation options for the output raster.
+
+    Returns:
+        gdal.Dataset: The open output dataset.
+    """
+    geometry_type = _vector_geometry_type(vector_layer)
+    reference_ds = _open_raster(reference_raster)
+
+    if geometry_type in POINT_GEOMETRY_TYPES:
+        width, height = reference_ds.RasterXSize, reference_ds.RasterYSize
+
+        # Only points inside the grid can be burned, so let OGR skip the others while reading; the points are
+        # transformed to the grid's CRS like the features GDAL rasterizes below
+        xs, ys = _read_vertices(vector_layer, reference_ds=reference_ds)
+
+        # Map every point to its pixel at once with the inverse geotransform
+        col_origin, col_x, col_y, row_origin, row_x, row_y = gdal.InvGeoTransform(reference_ds.GetGeoTransform())
+        cols = np.floor(col_origin + col_x * xs + col_y * ys).astype(np.int64)
+        rows = np.floor(row_origin + row_x * xs + row_y * ys).astype(np.int64)
+        inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+
+        # The raster is binary, so a plain scatter assignment suffices; counting hits with np.add.at is not needed
+        burned = np.full((height, width), 0 if init_value is None else init_value, dtype=np.uint8)
+        burned[rows[inside], cols[inside]] = 1
+
+        return _write_array(
+            burned, reference_ds, output_path, gdal.GDT_Byte, nodata, driver_name, creation_options
+        )
+
+    output_ds = _make_like(reference_ds, gdal.GDT_Byte, nodata, output_path, driver_name, creation_options)
+    if init_value is None:
+        init_value = nodata if _has_nodata(nodata) else 0
+    output_ds.GetRasterBand(1).Fill(init_value)
+
+    # Features are reprojected to the raster's CRS by GDAL when the layer uses a different one
+    vector_ds, layer = _open_vector(vector_layer, reference_ds)
+    if geometry_type in POLYGON_GEOMETRY_TYPES:
+        options = ["OPTIM=VECTOR"]
+    else:
+        options = ["ALL_TOUCHED=TRUE"]
+    gdal.RasterizeLayer(output_ds, [1], layer, burn_values=[1], options=options)
+    vector_ds = None
+
+    return output_ds
+
+
+def _memmap_band(dataset):
+    """
+    Maps the first band of a GeoTIFF into a copy-on-write float32 array, when its pixels are one contiguous run.
+
+    Returns:
+        np.memmap or None: The (height, width) array, or None if the file has several bands, or the band is
+            compressed, tiled, not float32, not in native byte order, not stored contiguously, or not backed
+            by a regular file.
+    """
+    # Only single-band files are mapped: a single-strip, pixel-interleaved multi-band file would pass the
+    # contiguity check below while interleaving the values of every band
+    if dataset.GetDriver().ShortName != "GTiff" or dataset.RasterCount != 1:
+        return None
+    band = dataset.GetRasterBand(1)
+    if band.DataType != gdal.GDT_Float32:
+        return None
+    if dataset.GetMetadataItem("COMPRESSION", "IMAGE_STRUCTURE") is not None:
+        return None
+
+    width, height = dataset.RasterXSize, dataset.RasterYSize
+    block_width, block_height = band.GetBlockSize()
+    path = dataset.GetDescription()
+    if block_width != width or not os.path.isfile(path):
+        return None
+
+    # Every strip must directly follow the previous one for the band to be a single (height, width) array
+    strip_bytes = block_width * block_height * 4
+    strips = (height + block_height - 1) // block_height
+    offsets = [band.GetMetadataItem(f"BLOCK_OFFSET_0_{strip}", "TIFF") for strip in range(strips)]
+    if any(offset is None or int(offset) == 0 for offset in offsets):
+        return None
+    offsets = [int(offset) for offset in offsets]
+    if any(offsets[i] - offsets[0] != i * strip_bytes for i in range(strips)):
+        return None
+
+    with open(path, "rb") as file:
+        byte_order = file.read(2)
+    if byte_order != (b"II" if sys.byteorder == "little" else b"MM"):
+        return None
+
+    return np.memmap(path, dtype=np.float32, mode="c", offset=offsets[0], shape=(height, width))
+
+
+def _output_array(shape, out=None):
+    """
+    Returns `out` after checking it can receive a float32 raster of the given shape, or a new array if it is None.
+
+    Raises:
+        ValueError: If `out` is not a C-contiguous float32 array of that shape.
+    """
+    if out is None:
+        return np.empty(shape, dtype=np.float32)
+    if out.shape != tuple(shape) or out.dtype != np.float32 or not out.flags.c_contiguous:
+        raise ValueError(f"The output array must be a C-contiguous float32 array of shape {tuple(shape)}.")
+    return out
+
+
+def _read_values(dataset, nodata=None, out=None):
+    """
+    Reads the first band of an open dataset as a float32 array, with NoData replaced by np.nan.
+
+    Args:
+        dataset (gdal.Dataset): The dataset to read.
+        nodata (float, optional): The NoData value; defaults to the one set on the band.
+        out (np.ndarray, optional): A preallocated float32 array of shape (height, width) to read into.
+
+    Returns:
+        np.ndarray: The values, stored in `out` when it is given.
+    """
+    band = dataset.GetRasterBand(1)
+    if nodata is None:
+        nodata = band.GetNoDataValue()
+
+    # Read the whole band in a single GDAL call instead of querying each pixel from Python,
+    # letting GDAL convert to float32 while reading instead of casting a float64 copy afterwards
+    if out is None:
+        values = band.ReadAsArray(buf_type=gdal.GDT_Float32)
+    else:
+        values = band.ReadAsArray(buf_obj=out)
+
+    if nodata is not None:
+        # NoData is an exact sentinel, so mask it in place rather than building np.isclose/np.where temporaries
+        values[values == nodata] = np.nan
+
+    return values
+
+
+def _vector_geometry_type(vector_layer):
+    """
+    Returns the flattened OGR geometry type (e.g. `ogr.wkbPoint`) of a vector layer.
+    """
+    vector_ds, layer = _open_vector(vector_layer)
+    return ogr.GT_Flatten(layer.GetGeomType())
+
+
+def _open_vector(vector_layer, reference_ds=None):
+    """
+    Opens the file behind a vector layer with OGR for a single geometry-only pass over its features.
+
+    Attribute fields are skipped when reading features. If a reference dataset in the same CRS is given, a
+    spatial filter on its bounds also makes OGR (and the layer's spatial index, when the format has one)
+    skip features outside the grid.
+
+    Returns:
+        tuple: The open `ogr.DataSource`, which must be kept alive while reading, and its first `ogr.Layer`.
+    """
+    vector_ds = ogr.Open(vector_layer.source())
+    if vector_ds is None:
+        raise IOError(f"Could not open file: {vector_layer.source()}")
+    layer = vector_ds.GetLayer()
+
+    definition = layer.GetLayerDefn()
+    layer.SetIgnoredFields([definition.GetFieldDefn(i).GetName() for i in range(definition.GetFieldCount())])
+
+    if reference_ds is not None:
+        if _same_crs(layer, reference_ds):
+            # Bound all four corners of the grid, so the rect also covers grids with rotation terms
+            geotransform = reference_ds.GetGeoTransform()
+            corners = [
+                gdal.ApplyGeoTransform(geotransform, col, row)
+                for col in (0, reference_ds.RasterXSize)
+                for row in (0, reference_ds.RasterYSize)
+            ]
+            xs, ys = zip(*corners)
+            layer.SetSpatialFilterRect(min(xs), min(ys), max(xs), max(ys))
+
+    return vector_ds, layer
+
+
+def _read_vertices(vector_layer, spacing=None, reference_ds=None, clip=True):
+    """
+    Reads the vertex coordinates of every feature in a vector layer.
+
+    Args:
+        vector_layer: The vector layer to read.
+        spacing (float, optional): If given, lines and polygon rings are densified so that consecutive
+            vertices are at most this distance apart, in the units of the returned coordinates.
+        reference_ds (gdal.Dataset, optional): If given, the coordinates are transformed to its CRS when the
+            layer uses a different one.
+        clip (bool, optional): With `reference_ds`, only read features intersecting its bounds. Set it to False
+            when features outside the grid still matter, e.g. for distances.
+
+    Returns:
+        tuple: Two float64 NumPy arrays (xs, ys) with the coordinates of every vertex.
+    """
+    vector_ds, layer = _open_vector(vector_layer, reference_ds if clip else None)
+    transform = None if reference_ds is None else _grid_transform(layer, reference_ds)
+
+    parts = []
+    for feature in layer:
+        geometry = feature.GetGeometryRef()
+        if geometry is not None:
+            if transform is not None:
+                geometry.Transform(transform)
+            parts.extend(_geometry_parts(geometry))
+
+    if spacing is not None:
+        parts = [_densify(part, spacing) for part in parts]
+
+    coords = np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.float64)
+    return coords[:, 0], coords[:, 1]
+
+
+def _same_crs(layer, reference_ds):
+    """
+    Returns whether an OGR layer and a GDAL dataset share a CRS; a missing CRS is assumed to match.
+    """
+    layer_srs = layer.GetSpatialRef()
+    grid_srs = reference_ds.GetSpatialRef()
+    return layer_srs is None or grid_srs is None or layer_srs.IsSame(grid_srs)
+
+
+def _grid_transform(layer, reference_ds):
+    """
+    Returns the transformation from an OGR layer's CRS to a GDAL dataset's, or None when they already match.
+    """
+    if _same_crs(layer, reference_ds):
+        return None
+    layer_srs = layer.GetSpatialRef().Clone()
+    grid_srs = reference_ds.GetSpatialRef().Clone()
+    # Keep (x, y) as (easting, northing) or (longitude, latitude), whatever axis order the CRS defines
+    for srs in (layer_srs, grid_srs):
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return osr.CoordinateTransformation(layer_srs, grid_srs)
+
+
+def _geometry_parts(geometry):
+    """
+    Returns the vertices of an OGR geometry as a list of (n, 2) arrays, one per point, line, or polygon ring.
+    """
+    if geometry.GetGeometryCount() > 0:
+        parts = []
+        for i in range(geometry.GetGeometryCount()):
+            parts.extend(_geometry_parts(geometry.GetGeometryRef(i)))
+        return parts
+    points = geometry.GetPoints() or []
+    return [np.array([point[:2] for point in points], dtype=np.float64).reshape(-1, 2)]
+
+
+def _densify(vertices, spacing):
+    """
+    Inserts evenly spaced vertices along each segment of a line so that no segment is longer than `spacing`.
+    """
+    if len(vertices) < 2:
+        return vertices
+
+    segments = np.diff(vertices, axis=0)
+    lengths = np.hypot(segments[:, 0], segments[:, 1])
+    steps = np.maximum(np.ceil(lengths / spacing).astype(np.int64), 1)
+
+    segment_index = np.repeat(np.arange(len(segments)), steps)
+    step_index = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    fraction = step_index / np.repeat(steps, steps)
+
+    dense = vertices[segment_index] + segments[segment_index] * fraction[:, None]
+    return np.vstack([dense, vertices[-1:]])
+
+
+def _open_raster(raster_layer):
+    """
+    Opens the file behind a raster layer as a read-only GDAL dataset.
+    """
+    dataset = gdal.Open(raster_layer.source(), gdalconst.GA_ReadOnly)
+    if dataset is None:
+        raise IOError(f"Could not open file: {raster_layer.source()}")
+    return dataset
+
+
+def _pixel_centers(dataset):
+    """
+    Returns two 2D arrays with the x and y coordinates of every pixel center of a north-up GDAL dataset.
+
+    The rotation terms of the geotransform are ignored; see `_grid_xy`.
+    """
+    x_origin, pixel_width, _, y_origin, _, pixel_height = dataset.GetGeoTransform()
+    return _grid_xy(x_origin, y_origin, dataset.RasterXSize, dataset.RasterYSize, pixel_width, pixel_height)
+
+
+# Every aligned raster shares the DTM grid, so keep only the latest pair of arrays; each pair is two float64
+# copies of the full grid and more entries would hold that memory for grids that are no longer used.
+@functools.lru_cache(maxsize=1)
+def _grid_xy(x_origin, y_origin, width, height, pixel_width, pixel_height):
+    """
+    Builds read-only pixel-center coordinate arrays for a north-up grid, cached for the last grid definition.
+
+    `pixel_height` follows the GDAL geotransform convention and is negative for north-up rasters.
+    """
+    # Pixel centers along each axis, broadcast to the full grid in row-major order
+    xs = x_origin + (np.arange(width) + 0.5) * pixel_width
+    ys = y_origin + (np.arange(height) + 0.5) * pixel_height
+    x_coords, y_coords = np.meshgrid(xs, ys)
+    x_coords.setflags(write=False)
+    y_coords.setflags(write=False)
+    return x_coords, y_coords
+
+
+def _make_like(
+    template_ds, data_type=gdal.GDT_Byte, nodata=0, output_path="", driver_name="MEM",
+    creation_options=TILED_CREATION_OPTIONS,
+):
+    """
+    Creates a single-band raster with the size, projection, and geotransform of a template dataset.
+
+    This is the one place where the pipeline allocates rasters on the DTM grid: the rasterized masks, the
+    distance rasters, and every written array are created here, in memory by default.
+
+    Args:
+        template_ds (gdal.Dataset): The dataset whose grid is copied.
+        data_type (int, optional): The GDAL data type of the band, e.g. `gdal.GDT_Float32`.
+        nodata (float, optional): The NoData value of the band; None or NaN leaves the band without one.
+        output_path (str, optional): The file path of the new raster (ignored by the MEM driver).
+        driver_name (str, optional): The GDAL driver used to create the raster.
+        creation_options (list, optional): GeoTIFF creation options, only used by the GTiff driver.
+
+    Returns:
+        gdal.Dataset: The open, empty dataset.
+    """
+    driver = gdal.GetDriverByName(driver_name)
+    output_ds = driver.Create(
+        output_path, template_ds.RasterXSize, template_ds.RasterYSize, 1, data_type,
+        options=_with_predictor(creation_options, data_type) if driver_name == "GTiff" else [],
     )
-    print("Vector layer successfully rasterized.")
-    return load_raster(output_path, "binary_raster")
+    if output_ds is None:
+        raise IOError(f"Could not create file: {output_path}")
+
+    output_ds.SetProjection(template_ds.GetProjection())
+    output_ds.SetGeoTransform(template_ds.GetGeoTransform())
+    if _has_nodata(nodata):
+        output_ds.GetRasterBand(1).SetNoDataValue(nodata)
+    return output_ds
+
+
+def _has_nodata(nodata):
+    """
+    Returns whether a NoData value is set; QGIS reports a missing NoData as NaN and GDAL as None.
+    """
+    return nodata is not None and not math.isnan(nodata)
+
+
+def _with_predictor(creation_options, data_type):
+    """
+    Adds the LZW predictor suited to a band data type: horizontal differencing for integers and
+    floating-point prediction for floats. Uncompressed option lists are returned unchanged.
+    """
+    if "COMPRESS=LZW" not in creation_options:
+        return creation_options
+    is_float = data_type in (gdal.GDT_Float32, gdal.GDT_Float64)
+    return [*creation_options, "PREDICTOR=3" if is_float else "PREDICTOR=2"]
+
+
+def _write_array(
+    array, reference_ds, output_path, data_type, nodata, driver_name="GTiff", creation_options=TILED_CREATION_OPTIONS
+):
+    """
+    Writes a 2D array to a single-band raster with the projection and geotransform of a reference dataset.
+
+    Returns:
+        gdal.Dataset: The open output dataset; GeoTIFFs are flushed to disk once it is released.
+    """
+    output_ds = _make_like(reference_ds, data_type, nodata, output_path, driver_name, creation_options)
+    output_ds.GetRasterBand(1).WriteArray(array)
+    return output_ds
@@ -1,40 +1,65 @@
+import argparse
+import contextlib
 import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 
-from qgis.core import QgsApplication
+import numpy as np
 
 from flood_classification import (
+    BACKENDS,
+    set_backend,
+    configure_gdal,
     check_resolution_and_crs,
     load_flood_points,
     load_raster,
-    raster_to_dataframe,
     transform_to_raster,
-    create_final_dataframe,
     calculate_distance_to_features,
-    transform_vector_to_binary_raster
+    transform_vector_to_binary_raster,
+    write_final_parquet
 )
 
 os.environ["QT_QPA_PLATFORM"] = "offscreen" 
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the flood classification dataset.")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="qgis",
+        help="Load layers through QGIS, or read them with GDAL/OGR only and skip starting QGIS.",
+    )
+    return parser.parse_args()
+
+
 def main():
-    QgsApplication.setPrefixPath(
-        "C:/OSGeo4W/bin", True
-    )  # Change path based on qgis instalattion and system
-    qgs = QgsApplication([], False)
-    qgs.initQgis()
-
-    dtm = None
-    lulc = None
-    flood_points = None
-    flood_raster = None
-    river_layer = None
-    tributaries_layer = None
-    basin_layer = None
+    args = parse_args()
+    set_backend(args.backend)
 
     target_resolution = 50.0
     print(f"Processing data with a target resolution of {target_resolution}m.")
+    # Only export pixels inside the basin; the rest of the 1 km buffer carries no training signal
+    basin_only = True
+
+    # Cleanups run in reverse order of registration, whether processing succeeds or fails
+    with contextlib.ExitStack() as stack:
+        if args.backend == "qgis":
+            from qgis.core import QgsApplication
+
+            # Set QGIS_PREFIX_PATH to the QGIS installation, e.g. /usr or C:/OSGeo4W/apps/qgis
+            QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "C:/OSGeo4W/bin"), True)
+            qgs = QgsApplication([], False)
+            qgs.initQgis()
+            stack.callback(print, "QGIS exited.")
+            stack.callback(qgs.exitQgis)
+
+        configure_gdal()
+
+        # Layers are kept on a namespace that is cleared on exit, so they are released before QGIS exits
+        layers = SimpleNamespace()
+        stack.callback(vars(layers).clear)
 
-    try:
         path_dtm = "data/DigitalTerrainModel/DTM_TTI_buffer_1km_FILLED.tif"
         path_lulc = "data/LandUseLandCover/LULC_10m_TTI_clipped_1km.tif"
         path_floods = "data/SHP_floods_2019/Ocorrencias_Alag_2019.shp"
@@ -42,48 +67,66 @@ def main():
         path_tributaries = "data/SHP_Tamanduatei/Afluentes_Tamanduatei.shp"
         path_basin = "data/SHP_Tamanduatei/Bacia_Tamanduatei.shp"
 
-        dtm = load_raster(path_dtm, "dtm")
-        lulc = load_raster(path_lulc, "lulc")
-        flood_points = load_flood_points(path_floods, "flood_points")
-        river_layer = load_flood_points(path_river, "river_layer")
-        tributaries_layer = load_flood_points(path_tributaries, "tributaries_layer")
-        basin_layer = load_flood_points(path_basin, "basin_layer")
+        layers.dtm = load_raster(path_dtm, "dtm")
+        layers.lulc = load_raster(path_lulc, "lulc")
+        layers.flood_points = load_flood_points(path_floods, "flood_points")
+        layers.river = load_flood_points(path_river, "river_layer")
+        layers.tributaries = load_flood_points(path_tributaries, "tributaries_layer")
+        layers.basin = load_flood_points(path_basin, "basin_layer")
 
 
         os.makedirs("temp", exist_ok=True)
         path_resampled_dtm = "temp/resampled_dtm.tif"
         path_resampled_lulc = "temp/resampled_lulc.tif"
-        path_temp_flood = "temp/flood_raster.tif"
-        path_temp_river_dist = "temp/river_dist.tif"
-        path_temp_tributaries_dist = "temp/tributaries_dist.tif"
-        path_temp_basin = "temp/basin_binary.tif"
 
-        dtm, lulc = check_resolution_and_crs(
-            dtm, lulc, path_dtm, path_lulc, path_resampled_dtm, path_resampled_lulc, target_resolution
+        layers.dtm, layers.lulc = check_resolution_and_crs(
+            layers.dtm, layers.lulc, path_dtm, path_lulc,
+            path_resampled_dtm, path_resampled_lulc, target_resolution,
         )
-        flood_raster = transform_to_raster(flood_points, dtm, path_temp_flood, target_resolution)
-        river_raster = calculate_distance_to_features(river_layer, dtm, path_temp_river_dist, target_resolution)
-        tributaries_raster = calculate_distance_to_features(tributaries_layer, dtm, path_temp_tributaries_dist, target_resolution)
-        basin_raster = transform_vector_to_binary_raster(basin_layer, dtm, path_temp_basin, target_resolution)
-
-        dtm_df = raster_to_dataframe(dtm)
-        lulc_df = raster_to_dataframe(lulc)
-        flood_df = raster_to_dataframe(flood_raster)
-        river_df = raster_to_dataframe(river_raster)
-        tributaries_df = raster_to_dataframe(tributaries_raster)
-        basin_df = raster_to_dataframe(basin_raster)
-
-        final_df = create_final_dataframe(dtm_df, lulc_df, flood_df, river_df, tributaries_df, basin_df)
 
-        final_df.to_parquet("temp/final_data.parquet")
+        # The four derived layers are written into one preallocated buffer with a contiguous plane per layer,
+        # laid out on the DTM grid, instead of four separate allocations
+        layer_values = np.empty((4, layers.dtm.height(), layers.dtm.width()), dtype=np.float32)
+        flood_values, river_distances, tributaries_distances, basin_values = layer_values
+
+        # The four layers only share the DTM grid as a template, and the GDAL calls behind them release the GIL,
+        # so they can run in parallel threads
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # The layers are only consumed as dataset columns, so keep them as arrays instead of writing rasters;
+            # no output path is passed since nothing is written
+            futures = [
+                executor.submit(
+                    transform_to_raster,
+                    layers.flood_points, layers.dtm, None, target_resolution,
+                    return_array=True, out=flood_values,
+                ),
+                executor.submit(
+                    calculate_distance_to_features,
+                    layers.river, layers.dtm, None, target_resolution,
+                    return_array=True, out=river_distances,
+                ),
+                executor.submit(
+                    calculate_distance_to_features,
+                    layers.tributaries, layers.dtm, None, target_resolution,
+                    return_array=True, out=tributaries_distances,
+                ),
+                executor.submit(
+                    transform_vector_to_binary_raster,
+                    layers.basin, layers.dtm, None, target_resolution,
+                    return_array=True, out=basin_values,
+                ),
+            ]
+            for future in futures:
+                future.result()
+
+        # Stream the rasters into the final dataset window by window instead of building six DataFrames
+        write_final_parquet(
+            layers.dtm, layers.lulc, flood_values, river_distances, tributaries_distances, basin_values,
+            "temp/final_data.parquet", basin_only=basin_only,
+        )
 
         print("All files exported.")
 
-    finally:
-        del dtm, lulc, flood_points, flood_raster
-        qgs.exitQgis()
-        print("QGIS exited.")
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The package lives under src/ and is run from there (see the Dockerfile), so make it importable for the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
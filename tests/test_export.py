@@ -0,0 +1,166 @@
+import json
+
+import numpy as np
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+gdal = pytest.importorskip("osgeo.gdal")
+ogr = pytest.importorskip("osgeo.ogr")
+osr = pytest.importorskip("osgeo.osr")
+pq = pytest.importorskip("pyarrow.parquet")
+export = pytest.importorskip("flood_classification.export")
+load = pytest.importorskip("flood_classification.load")
+
+NODATA = -9999.0
+
+
+def _reference_hilbert(n, x, y):
+    """
+    The textbook (x, y) to distance conversion of a Hilbert curve filling an n x n grid.
+    """
+    d = 0
+    s = n // 2
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = n - 1 - x, n - 1 - y
+            x, y = y, x
+        s //= 2
+    return d
+
+
+def _write_dtm(path, values, pixel_size=50.0):
+    """
+    Writes a float32 DTM in EPSG:31982 with its top-left corner at (600000, 7200000).
+    """
+    height, width = values.shape
+    dataset = gdal.GetDriverByName("GTiff").Create(str(path), width, height, 1, gdal.GDT_Float32)
+    dataset.SetGeoTransform((600000.0, pixel_size, 0.0, 7200000.0, 0.0, -pixel_size))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(31982)
+    dataset.SetProjection(srs.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(NODATA)
+    band.WriteArray(values)
+    dataset = None
+    return load.GdalRasterLayer(str(path), "dtm")
+
+
+def test_hilbert_index_matches_reference():
+    rows, cols = np.divmod(np.arange(64), 8)
+
+    result = export._hilbert_index(rows, cols, 3)
+
+    expected = [_reference_hilbert(8, int(col), int(row)) for row, col in zip(rows, cols)]
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_hilbert_index_is_a_continuous_bijection():
+    rows, cols = np.divmod(np.arange(64), 8)
+
+    result = export._hilbert_index(rows, cols, 3)
+
+    np.testing.assert_array_equal(np.sort(result), np.arange(64))
+    order = np.argsort(result)
+    steps = np.abs(np.diff(rows[order])) + np.abs(np.diff(cols[order]))
+    assert (steps == 1).all()
+
+
+def test_wkb_points_round_trip():
+    xs = np.array([600025.0, -1.5, 1e-9])
+    ys = np.array([7199975.0, 2.25, -3e7])
+
+    result = export._wkb_points(xs, ys)
+
+    assert len(result) == xs.size
+    for wkb, x, y in zip(result.to_pylist(), xs, ys):
+        geometry = ogr.CreateGeometryFromWkb(wkb)
+        assert geometry.GetGeometryName() == "POINT"
+        assert (geometry.GetX(), geometry.GetY()) == (x, y)
+
+
+def test_write_final_parquet(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "ROW_GROUP_SIZE", 40)
+    height, width = 13, 11
+    dtm_values = np.full((height, width), 750.0, dtype=np.float32)
+    dtm_values[0, 0] = NODATA
+    dtm = _write_dtm(tmp_path / "dtm.tif", dtm_values)
+    lulc = np.full((height, width), 3, dtype=np.float32)
+    lulc[1, 2] = np.nan
+    flood = np.zeros((height, width), dtype=np.float32)
+    distances = np.arange(height * width, dtype=np.float32).reshape(height, width)
+    basin = np.ones((height, width), dtype=np.float32)
+    output_path = tmp_path / "final_data.parquet"
+
+    total_rows = export.write_final_parquet(
+        dtm, lulc, flood, distances, distances, basin, str(output_path), block_size=(4, 4)
+    )
+
+    parquet = pq.ParquetFile(output_path)
+    assert total_rows == parquet.metadata.num_rows == height * width - 2
+    row_groups = [parquet.metadata.row_group(i) for i in range(parquet.metadata.num_row_groups)]
+    assert [group.num_rows for group in row_groups] == [40, 40, 40, total_rows - 120]
+
+    hilbert_column = parquet.schema_arrow.get_field_index("hilbert_index")
+    table = parquet.read()
+    offset = 0
+    for group in row_groups:
+        assert [column.column_index for column in group.sorting_columns] == [hilbert_column]
+        group_index = table["hilbert_index"].to_numpy()[offset:offset + group.num_rows]
+        assert (np.diff(group_index.astype(np.int64)) > 0).all()
+        offset += group.num_rows
+
+    geo = json.loads(parquet.schema_arrow.metadata[b"geo"])
+    assert geo["primary_column"] == "geometry"
+    assert geo["columns"]["geometry"]["encoding"] == "WKB"
+    assert geo["columns"]["geometry"]["crs"]["id"] == {"authority": "EPSG", "code": 31982}
+
+    rows = table["row"].to_numpy()
+    cols = table["col"].to_numpy()
+    np.testing.assert_array_equal(table["x"].to_numpy(), 600000.0 + (cols + 0.5) * 50.0)
+    np.testing.assert_array_equal(table["y"].to_numpy(), 7200000.0 - (rows + 0.5) * 50.0)
+    np.testing.assert_array_equal(table["dist_to_river"].to_numpy(), distances[rows, cols])
+
+
+def _encode(name, values):
+    field = export.PARQUET_SCHEMA.field(name) if isinstance(name, str) else name
+    return export._encode_column(np.array(values, dtype=np.float32), field)
+
+
+def test_encode_dtm_round_trips_decimetres():
+    elevations = np.array([0.0, 123.4, -5.26, 812.37, 3276.7, -3276.8], dtype=np.float32)
+
+    result = _encode("dtm_value", elevations)
+
+    assert result.type == pa.int16()
+    assert result.null_count == 0
+    assert result.to_pylist() == [0, 1234, -53, 8124, 32767, -32768]
+    np.testing.assert_allclose(result.to_numpy() * 0.1, elevations, atol=0.05)
+
+
+def test_encode_dtm_writes_nan_and_out_of_range_as_null():
+    result = _encode("dtm_value", [np.nan, 3276.8, -3276.9, 5000.0, 3276.7])
+
+    assert result.to_pylist() == [None, None, None, None, 32767]
+
+
+def test_encode_distance_clips_to_uint16():
+    result = _encode("dist_to_river", [-3.0, 0.4, 1234.4, 65535.0, 70000.0, np.nan])
+
+    assert result.type == pa.uint16()
+    assert result.to_pylist() == [0, 0, 1234, 65535, 65535, None]
+
+
+def test_encode_field_without_metadata():
+    result = _encode(pa.field("value", pa.int16()), [1.4, -2.6, 40000.0, -40000.0, np.nan])
+
+    assert result.to_pylist() == [1, -3, 32767, -32768, None]
+
+
+def test_encode_lulc_out_of_range_is_null():
+    result = _encode("lulc_code", [0.0, 3.0, 255.0, 256.0, -1.0, np.nan])
+
+    assert result.to_pylist() == [0, 3, 255, None, None, None]
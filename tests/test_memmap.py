@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+process = pytest.importorskip("flood_classification.process")
+load = pytest.importorskip("flood_classification.load")
+
+NODATA = -9999.0
+
+
+def _write_tiff(path, bands, options):
+    """
+    Writes float32 bands of shape (height, width) to a GeoTIFF with the given creation options.
+    """
+    height, width = bands[0].shape
+    dataset = gdal.GetDriverByName("GTiff").Create(str(path), width, height, len(bands), gdal.GDT_Float32, options)
+    dataset.SetGeoTransform((0.0, 50.0, 0.0, 0.0, 0.0, -50.0))
+    for index, values in enumerate(bands, start=1):
+        band = dataset.GetRasterBand(index)
+        band.SetNoDataValue(NODATA)
+        band.WriteArray(values)
+    dataset = None
+    return path
+
+
+def _expected(path):
+    dataset = gdal.Open(str(path))
+    values = dataset.GetRasterBand(1).ReadAsArray().astype(np.float32)
+    values[values == NODATA] = np.nan
+    return values
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(700, 800, size=(37, 53)).astype(np.float32)
+    values[3, 5] = NODATA
+    return values
+
+
+@pytest.mark.parametrize(
+    "options, band_count, mapped",
+    [
+        (["ROWSPERSTRIP=4"], 1, True),
+        (["ROWSPERSTRIP=64"], 1, True),
+        (["TILED=YES", "BLOCKXSIZE=16", "BLOCKYSIZE=16"], 1, False),
+        (["COMPRESS=LZW"], 1, False),
+        (["INTERLEAVE=PIXEL", "ROWSPERSTRIP=64"], 3, False),
+        (["INTERLEAVE=BAND", "ROWSPERSTRIP=4"], 3, False),
+    ],
+)
+def test_mmap_matches_read_as_array(tmp_path, values, options, band_count, mapped):
+    bands = [values + 1000 * index for index in range(band_count)]
+    path = _write_tiff(tmp_path / "raster.tif", bands, options)
+    layer = load.GdalRasterLayer(str(path), "raster")
+
+    result = process.raster_to_values(layer, mmap=True)
+
+    assert isinstance(result, np.memmap) == mapped
+    np.testing.assert_array_equal(result, _expected(path))
+
+
+def test_mmap_leaves_file_unchanged(tmp_path, values):
+    path = _write_tiff(tmp_path / "raster.tif", [values], ["ROWSPERSTRIP=4"])
+    layer = load.GdalRasterLayer(str(path), "raster")
+
+    result = process.raster_to_values(layer, mmap=True)
+    result[0, 0] = 0.0
+
+    assert _expected(path)[0, 0] == values[0, 0]
+
+
+def test_mmap_fills_out(tmp_path, values):
+    path = _write_tiff(tmp_path / "raster.tif", [values], ["ROWSPERSTRIP=4"])
+    layer = load.GdalRasterLayer(str(path), "raster")
+    out = np.zeros(values.shape, dtype=np.float32)
+
+    result = process.raster_to_values(layer, out=out, mmap=True)
+
+    assert result is out
+    np.testing.assert_array_equal(out, _expected(path))
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+ogr = pytest.importorskip("osgeo.ogr")
+osr = pytest.importorskip("osgeo.osr")
+process = pytest.importorskip("flood_classification.process")
+load = pytest.importorskip("flood_classification.load")
+
+PIXEL_SIZE = 100.0
+ORIGIN = (600000.0, 7200000.0)
+POINT_PIXELS = [(5, 7), (12, 3)]
+
+
+def _srs(epsg):
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(epsg)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+
+def _pixel_center(row, col):
+    return ORIGIN[0] + (col + 0.5) * PIXEL_SIZE, ORIGIN[1] - (row + 0.5) * PIXEL_SIZE
+
+
+@pytest.fixture
+def grid(tmp_path):
+    """
+    A 20 x 20 float32 grid in SIRGAS 2000 / UTM zone 22S.
+    """
+    path = str(tmp_path / "dtm.tif")
+    dataset = gdal.GetDriverByName("GTiff").Create(path, 20, 20, 1, gdal.GDT_Float32)
+    dataset.SetGeoTransform((ORIGIN[0], PIXEL_SIZE, 0.0, ORIGIN[1], 0.0, -PIXEL_SIZE))
+    dataset.SetProjection(_srs(31982).ExportToWkt())
+    dataset.GetRasterBand(1).Fill(750.0)
+    dataset = None
+    return load.GdalRasterLayer(path, "dtm")
+
+
+@pytest.fixture
+def points(tmp_path):
+    """
+    Points at the centers of `POINT_PIXELS`, stored in geographic WGS 84 coordinates.
+    """
+    path = str(tmp_path / "points.gpkg")
+    to_wgs84 = osr.CoordinateTransformation(_srs(31982), _srs(4326))
+    dataset = ogr.GetDriverByName("GPKG").CreateDataSource(path)
+    layer = dataset.CreateLayer("points", _srs(4326), ogr.wkbPoint)
+    for row, col in POINT_PIXELS:
+        lon, lat, _ = to_wgs84.TransformPoint(*_pixel_center(row, col))
+        feature = ogr.Feature(layer.GetLayerDefn())
+        point = ogr.Geometry(ogr.wkbPoint)
+        point.AddPoint_2D(lon, lat)
+        feature.SetGeometry(point)
+        layer.CreateFeature(feature)
+    dataset = None
+    return load.OgrVectorLayer(path, "points")
+
+
+def test_points_are_burned_in_the_grid_crs(grid, points):
+    result = process.transform_vector_to_binary_raster(points, grid, None, PIXEL_SIZE, return_array=True)
+
+    expected = np.zeros((20, 20), dtype=np.float32)
+    for row, col in POINT_PIXELS:
+        expected[row, col] = 1
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_point_distances_are_measured_in_the_grid_crs(grid, points):
+    result = process.calculate_distance_to_features(points, grid, None, PIXEL_SIZE, return_array=True)
+
+    rows, cols = np.mgrid[0:20, 0:20]
+    xs, ys = _pixel_center(rows, cols)
+    expected = np.min([np.hypot(xs - x, ys - y) for x, y in (_pixel_center(*p) for p in POINT_PIXELS)], axis=0)
+    np.testing.assert_allclose(result, expected, atol=0.01)